@@ -0,0 +1,296 @@
+"""
+文章全文倒排索引
+在爬虫运行过程中增量建立索引，支持关键词排序检索以及作者、日期过滤
+"""
+
+import json
+import math
+import os
+import re
+from collections import Counter
+from datetime import date, datetime
+
+# 英文停用词（检索时没有区分度的高频词）
+STOP_WORDS = frozenset("""
+a about above after again against all am an and any are as at be because been
+before being below between both but by can could did do does doing down during
+each few for from further had has have having he her here hers herself him
+himself his how i if in into is it its itself just me more most my myself no nor
+not now of off on once only or other our ours ourselves out over own same she
+should so some such than that the their theirs them themselves then there these
+they this those through to too under until up very was we were what when where
+which while who whom why will with would you your yours yourself yourselves
+""".split())
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+# WordPress 会把撇号渲染为弯引号，切词前统一成 ASCII 撇号
+QUOTE_TABLE = str.maketrans({'\u2019': "'", '\u2018': "'"})
+
+# 标题中的词权重更高
+TITLE_WEIGHT = 3
+
+# BM25 参数
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+DATE_FORMATS = ('%B %d, %Y', '%b %d, %Y', '%b. %d, %Y', '%d %B %Y', '%Y-%m-%d', '%Y/%m/%d')
+
+
+def stem(word):
+    """轻量级英文词干提取，只处理最常见的屈折后缀"""
+    if len(word) <= 3 or word.isdigit():
+        return word
+    if word.endswith("'s"):
+        word = word[:-2]
+    if word.endswith('ies') and len(word) > 4:
+        return word[:-3] + 'y'
+    if word.endswith('sses'):
+        return word[:-2]
+    for suffix in ('ing', 'ed'):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)]
+            # running -> run, stopped -> stop
+            if len(word) > 3 and word[-1] == word[-2] and word[-1] not in 'lsz':
+                word = word[:-1]
+            return word
+    if word.endswith('s') and not word.endswith(('ss', 'us', 'is')):
+        return word[:-1]
+    return word
+
+
+def tokenize(text):
+    """将英文文本切分为小写、去停用词并提取词干后的词项列表"""
+    if not text:
+        return []
+    terms = []
+    for token in TOKEN_PATTERN.findall(text.lower().translate(QUOTE_TABLE)):
+        # 单个字符的词项没有检索意义
+        if len(token) < 2 or token in STOP_WORDS:
+            continue
+        terms.append(stem(token))
+    return terms
+
+
+def parse_date(value):
+    """将页面上的时间文本解析为 date，无法解析时返回 None"""
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text = value.strip()
+    try:
+        return datetime.fromisoformat(text.replace('Z', '+00:00')).date()
+    except ValueError:
+        pass
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+class ArticleIndex():
+    """
+    增量持久化的倒排索引
+
+    每篇文章以一行 JSON 追加写入 postings.jsonl（只保存词频和元数据，不保存正文），
+    启动时回放该文件重建内存中的倒排表；同一 URL 重复写入时以最后一次为准。
+    被覆盖的旧记录超过 COMPACT_MIN_STALE 条且多于有效文档数时自动压缩文件。
+    """
+
+    FILENAME = 'postings.jsonl'
+    COMPACT_MIN_STALE = 64
+
+    def __init__(self, index_dir):
+        self.index_dir = index_dir
+        self.path = os.path.join(index_dir, self.FILENAME)
+        self.postings = {}   # 词项 -> {文档ID: 词频}
+        self.docs = {}       # 文档ID -> 元数据
+        self.doc_terms = {}  # 文档ID -> 词频表，用于替换旧文档时撤销倒排项
+        self.total_length = 0
+        self.stale_records = 0  # 文件中已被覆盖的旧记录数
+        self._load()
+        self._maybe_compact()
+
+    def __len__(self):
+        return len(self.docs)
+
+    def _load(self):
+        """回放磁盘上的索引文件"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # 进程中断时最后一行可能不完整，直接跳过
+                    continue
+                self._apply(record)
+
+    def _apply(self, record):
+        """将一条文档记录合并到内存索引"""
+        doc_id = record['id']
+        if doc_id in self.docs:
+            self._remove(doc_id)
+            self.stale_records += 1
+        terms = record.pop('terms')
+        self.docs[doc_id] = record
+        self.doc_terms[doc_id] = terms
+        self.total_length += record['length']
+        for term, tf in terms.items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+
+    def _remove(self, doc_id):
+        """从内存索引中移除文档"""
+        for term in self.doc_terms.pop(doc_id):
+            posting = self.postings[term]
+            del posting[doc_id]
+            if not posting:
+                del self.postings[term]
+        self.total_length -= self.docs.pop(doc_id)['length']
+
+    def add(self, article, url=''):
+        """索引一篇文章并立即追加写入磁盘，返回文档ID"""
+        doc_id = url or f"{article.get('title', '')}|{article.get('time', '')}"
+
+        terms = Counter(tokenize(article.get('content', '')))
+        for term in tokenize(article.get('title', '')):
+            terms[term] += TITLE_WEIGHT
+        parsed = parse_date(article.get('time'))
+
+        record = {
+            'id': doc_id,
+            'url': url,
+            'title': article.get('title', ''),
+            'author': article.get('author', ''),
+            'time': article.get('time', ''),
+            'date': parsed.isoformat() if parsed else None,
+            'length': sum(terms.values()),
+            'terms': dict(terms),
+        }
+
+        os.makedirs(self.index_dir, exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n')
+
+        self._apply(record)
+        self._maybe_compact()
+        return doc_id
+
+    def _maybe_compact(self):
+        """旧记录过多时压缩，避免重复抓取同一批文章使文件无限增长"""
+        if self.stale_records >= self.COMPACT_MIN_STALE and self.stale_records > len(self.docs):
+            self.compact()
+
+    def compact(self):
+        """重写索引文件，去掉被覆盖的旧记录"""
+        os.makedirs(self.index_dir, exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for doc_id, meta in self.docs.items():
+                record = dict(meta, terms=self.doc_terms[doc_id])
+                f.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n')
+        os.replace(tmp_path, self.path)
+        self.stale_records = 0
+
+    def _date_bound(self, value):
+        """解析过滤条件中的日期"""
+        if not value:
+            return None
+        parsed = parse_date(value)
+        if parsed is None:
+            raise ValueError(f"无法解析日期: {value}")
+        return parsed.isoformat()
+
+    def _matches(self, doc, author, date_from, date_to):
+        """判断文档是否满足作者和日期过滤条件"""
+        if author and author not in doc['author'].lower():
+            return False
+        if date_from or date_to:
+            if not doc['date']:
+                return False
+            if date_from and doc['date'] < date_from:
+                return False
+            if date_to and doc['date'] > date_to:
+                return False
+        return True
+
+    def search(self, query='', author=None, date_from=None, date_to=None, limit=10):
+        """
+        按 BM25 相关度检索文章
+
+        author 为大小写不敏感的子串匹配；date_from / date_to 可以是 date 或 'YYYY-MM-DD'，
+        闭区间。query 为空时只按过滤条件返回，按日期倒序排列。
+        """
+        author = author.lower() if author else None
+        date_from = self._date_bound(date_from)
+        date_to = self._date_bound(date_to)
+
+        terms = set(tokenize(query))
+        if not terms:
+            docs = [doc for doc in self.docs.values()
+                    if self._matches(doc, author, date_from, date_to)]
+            docs.sort(key=lambda doc: doc['date'] or '', reverse=True)
+            return [self._result(doc, 0.0) for doc in docs[:limit]]
+
+        n_docs = len(self.docs)
+        avg_length = self.total_length / n_docs if n_docs else 0
+        scores = {}
+        for term in terms:
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = math.log(1 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+            for doc_id, tf in posting.items():
+                length = self.docs[doc_id]['length']
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        results = []
+        for doc_id, score in ranked:
+            doc = self.docs[doc_id]
+            if not self._matches(doc, author, date_from, date_to):
+                continue
+            results.append(self._result(doc, score))
+            if len(results) >= limit:
+                break
+        return results
+
+    def _result(self, doc, score):
+        """构造检索结果"""
+        return {
+            'title': doc['title'],
+            'author': doc['author'],
+            'time': doc['time'],
+            'url': doc['url'],
+            'score': round(score, 4),
+        }
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='检索已抓取的MIT招生博客文章')
+    parser.add_argument('query', nargs='?', default='', help='检索关键词')
+    parser.add_argument('--author', help='按作者过滤')
+    parser.add_argument('--since', help='起始日期 YYYY-MM-DD')
+    parser.add_argument('--until', help='截止日期 YYYY-MM-DD')
+    parser.add_argument('--limit', type=int, default=10, help='返回条数')
+    parser.add_argument('--index-dir', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'index'),
+                        help='索引目录')
+    args = parser.parse_args()
+
+    index = ArticleIndex(args.index_dir)
+    print(f"索引中共 {len(index)} 篇文章")
+    for i, hit in enumerate(index.search(args.query, args.author, args.since, args.until, args.limit), 1):
+        print(f"{i}. [{hit['score']}] {hit['title']} - {hit['author']} ({hit['time']})")
+        print(f"   {hit['url']}")
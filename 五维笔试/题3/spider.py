@@ -6,12 +6,16 @@ import re
 from urllib.parse import urljoin
 import os
 
+from article_index import ArticleIndex
+
 
 class Spider():
     def __init__(self):
         self.url = "https://mitadmissions.org/blogs/"
         self.browser = WebPage()
         self.data = []
+        # 抓取过程中同步建立全文索引，目录固定在本文件旁边，与启动时的工作目录无关
+        self.index = ArticleIndex(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'index'))
         
     def get_blog_list(self):
         """获取博客列表页面的所有文章链接"""
@@ -213,9 +217,8 @@ class Spider():
             
         print(f"正在保存数据到 {filename}...")
         
-        # 确保题3目录存在
-        os.makedirs('题3', exist_ok=True)
-        filepath = os.path.join('题3', filename)
+        # 保存到本文件所在的题3目录，与启动时的工作目录无关
+        filepath = os.path.join(os.path.dirname(os.path.abspath(__file__)), filename)
         
         with open(filepath, 'w', newline='', encoding='utf-8-sig') as csvfile:
             fieldnames = ['标题', '作者', '评论数', '时间', '文章内容', '文章图片']
@@ -237,34 +240,43 @@ class Spider():
         
         print(f"数据已保存到 {filepath}，共 {len(self.data)} 条记录")
     
+    def crawl(self, limit=10):
+        """逐篇抓取文章，每抓取到一篇立即产出，便于调用方实时消费"""
+        print("开始抓取MIT招生博客...")
+        
+        # 获取博客列表
+        blog_links = self.get_blog_list()
+        
+        if not blog_links:
+            print("未找到任何博客文章链接")
+            return
+        
+        print(f"准备抓取 {len(blog_links)} 篇文章的详细信息...")
+        
+        # 抓取每篇文章的详细信息
+        for i, link in enumerate(blog_links[:limit], 1):  # 限制抓取前limit篇文章
+            print(f"正在处理第 {i}/{min(len(blog_links), limit)} 篇文章...")
+            
+            article_data = self.get_article_details(link)
+            if article_data:
+                article_data['url'] = link
+                self.data.append(article_data)
+                self.index.add(article_data, url=link)
+                yield article_data
+            
+            # 添加延时避免请求过快
+            time.sleep(2)
+    
     def main(self):
         """主函数"""
         try:
-            print("开始抓取MIT招生博客...")
-            
-            # 获取博客列表
-            blog_links = self.get_blog_list()
-            
-            if not blog_links:
-                print("未找到任何博客文章链接")
-                return
-            
-            print(f"准备抓取 {len(blog_links)} 篇文章的详细信息...")
-            
-            # 抓取每篇文章的详细信息
-            for i, link in enumerate(blog_links[:10], 1):  # 限制抓取前10篇文章
-                print(f"正在处理第 {i}/{min(len(blog_links), 10)} 篇文章...")
-                
-                article_data = self.get_article_details(link)
-                if article_data:
-                    self.data.append(article_data)
-                
-                # 添加延时避免请求过快
-                time.sleep(2)
+            for _ in self.crawl(limit=10):
+                pass
             
             # 保存数据到CSV
             self.save_to_csv()
             
+            print(f"全文索引已更新，共 {len(self.index)} 篇文章")
             print("抓取完成！")
             
         except Exception as e:
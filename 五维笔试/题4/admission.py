@@ -0,0 +1,104 @@
+"""
+流式连接准入控制
+限制全局和单个客户端的并发流数量，超出时排队或快速拒绝
+"""
+
+import threading
+import time
+from collections import deque
+
+
+class AdmissionRejected(Exception):
+    """请求未被准入"""
+
+    def __init__(self, status, message, retry_after):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.retry_after = retry_after
+
+
+class AdmissionController():
+    """
+    并发流准入控制
+
+    全局最多 max_streams 个并发流，单个客户端最多 max_per_client 个（含排队中的）；
+    全局已满时按先来先到排队，队列最多 max_waiting 个，等待超过 wait_timeout 秒放弃。
+    """
+
+    def __init__(self, max_streams=64, max_per_client=4, max_waiting=16, wait_timeout=5.0, retry_after=5):
+        self.max_streams = max_streams
+        self.max_per_client = max_per_client
+        self.max_waiting = max_waiting
+        self.wait_timeout = wait_timeout
+        self.retry_after = retry_after
+        self.active = 0
+        self.rejected = 0
+        self._per_client = {}
+        self._waiters = deque()
+        self._cond = threading.Condition()
+
+    def acquire(self, client):
+        """为客户端申请一个并发流名额，未被准入时抛出 AdmissionRejected"""
+        with self._cond:
+            if self._per_client.get(client, 0) >= self.max_per_client:
+                self.rejected += 1
+                raise AdmissionRejected(429, "该客户端的并发流过多", self.retry_after)
+
+            if self.active < self.max_streams and not self._waiters:
+                self._admit(client)
+                return
+
+            if len(self._waiters) >= self.max_waiting:
+                self.rejected += 1
+                raise AdmissionRejected(503, "服务繁忙，请稍后重试", self.retry_after)
+
+            # 排队期间也计入该客户端的名额，避免单个客户端占满队列
+            ticket = object()
+            self._waiters.append(ticket)
+            self._per_client[client] = self._per_client.get(client, 0) + 1
+            deadline = time.monotonic() + self.wait_timeout
+            try:
+                while self._waiters[0] is not ticket or self.active >= self.max_streams:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.rejected += 1
+                        raise AdmissionRejected(503, "服务繁忙，请稍后重试", self.retry_after)
+                    self._cond.wait(remaining)
+                self.active += 1
+            except AdmissionRejected:
+                self._release_client(client)
+                raise
+            finally:
+                self._waiters.remove(ticket)
+                self._cond.notify_all()
+
+    def _admit(self, client):
+        self.active += 1
+        self._per_client[client] = self._per_client.get(client, 0) + 1
+
+    def _release_client(self, client):
+        count = self._per_client.get(client, 0) - 1
+        if count > 0:
+            self._per_client[client] = count
+        else:
+            self._per_client.pop(client, None)
+
+    def release(self, client):
+        """流结束时归还名额"""
+        with self._cond:
+            self.active -= 1
+            self._release_client(client)
+            self._cond.notify_all()
+
+    def stats(self):
+        """当前准入状态"""
+        with self._cond:
+            return {
+                "active": self.active,
+                "waiting": len(self._waiters),
+                "clients": len(self._per_client),
+                "rejected": self.rejected,
+                "max_streams": self.max_streams,
+                "max_per_client": self.max_per_client
+            }
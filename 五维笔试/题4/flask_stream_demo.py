@@ -3,33 +3,166 @@
 展示多种流式响应的实现方式
 """
 
-from flask import Flask, Response, request, render_template_string
+from flask import Flask, Response, request
+import functools
+import hashlib
 import json
+import os
+import sys
 import time
 import random
 import threading
+import uuid
 from datetime import datetime
 
-app = Flask(__name__)
+from stream_hub import Broadcast, Scheduler, Subscription, END
+from jobs import JobManager
+from admission import AdmissionController, AdmissionRejected
+from metrics import MetricsRegistry
+from profiling import Profiler
+from static_assets import StaticAsset, load_static_dir
+
+# 静态资源由预压缩的 /static 路由提供
+app = Flask(__name__, static_folder=None)
+
+# 后台任务执行器，耗时任务不占用请求线程；排队任务总数和单个客户端的任务数都有上限
+job_manager = JobManager(max_workers=4, retention=600, max_pending=16, max_per_client=4)
+
+# 流式端点的准入控制；/health、演示页面等轻量端点不经过这里，过载时仍能及时响应
+admission = AdmissionController(max_streams=64, max_per_client=4, max_waiting=16, wait_timeout=5.0)
+
+# 流式指标，通过 /metrics 以 Prometheus 文本格式输出
+metrics = MetricsRegistry()
+stream_active = metrics.gauge('stream_active', '当前打开的流数量', ['route'])
+stream_events = metrics.counter('stream_events_total', '已发送的事件（数据块）数量', ['route'])
+stream_bytes = metrics.counter('stream_bytes_total', '已发送的字节数', ['route'])
+stream_disconnects = metrics.counter('stream_disconnects_total', '数据未发送完就被客户端断开的流数量', ['route'])
+stream_rejected = metrics.counter('stream_rejected_total', '准入控制拒绝的请求数量', ['route', 'status'])
+stream_ttfb = metrics.histogram('stream_time_to_first_byte_seconds', '从接受请求到发送第一个数据块的耗时', ['route'])
+stream_interval = metrics.histogram('stream_event_interval_seconds', '相邻两个数据块之间的间隔', ['route'])
+stream_duration = metrics.histogram('stream_duration_seconds', '流生成器的总运行时间', ['route'],
+                                    buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600))
+metrics.callback('stream_admission', '准入控制状态', lambda: {
+    (key,): value for key, value in admission.stats().items()
+}, ['state'])
+metrics.callback('job_pool', '后台任务线程池状态', lambda: {
+    (key,): value for key, value in job_manager.stats().items()
+}, ['state'])
+metrics.callback('process_threads', '进程中的线程数量', lambda: {(): threading.active_count()})
+
+# 按需剖析：管理令牌由 STREAM_ADMIN_TOKEN 配置，STREAM_PROFILE_SAMPLE_RATE 为随机抽样比例
+profiler = Profiler(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profiles'),
+    admin_token=os.environ.get('STREAM_ADMIN_TOKEN'),
+    sample_rate=float(os.environ.get('STREAM_PROFILE_SAMPLE_RATE', 0))
+)
+
+def metered(route, chunks, started):
+    """包装流的数据块迭代器，记录发送量和时延；生成器运行时间从第一次取数据开始计算"""
+    stream_active.inc(route)
+    run_started = time.perf_counter()
+    last = None
+    completed = False
+    try:
+        for chunk in chunks:
+            now = time.perf_counter()
+            if last is None:
+                stream_ttfb.observe(now - started, route)
+            else:
+                stream_interval.observe(now - last, route)
+            last = now
+            stream_events.inc(route)
+            stream_bytes.inc(route, amount=len(chunk))
+            yield chunk
+        completed = True
+    finally:
+        stream_active.dec(route)
+        stream_duration.observe(time.perf_counter() - run_started, route)
+        if not completed:
+            stream_disconnects.inc(route)
+
+def stream_route(view):
+    """
+    流式端点的统一包装：准入控制、指标统计和按需剖析
+    
+    名额在响应结束（包括客户端断开）时归还；剖析覆盖视图函数和生成器的整个生命周期。
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        route = request.url_rule.rule
+        client = request.remote_addr
+        try:
+            admission.acquire(client)
+        except AdmissionRejected as e:
+            stream_rejected.inc(route, str(e.status))
+            return {"error": e.message}, e.status, {"Retry-After": str(e.retry_after)}
+        
+        session = profiler.start(route) if profiler.wants(request) else None
+        try:
+            response = app.make_response(view(*args, **kwargs))
+        except Exception:
+            admission.release(client)
+            if session is not None:
+                session.stop()
+            raise
+        
+        if response.is_streamed:
+            response.response = metered(route, response.iter_encoded(), started)
+            response.call_on_close(lambda: admission.release(client))
+            if session is not None:
+                response.call_on_close(session.stop)
+        else:
+            admission.release(client)
+            if session is not None:
+                session.stop()
+        return response
+    return wrapper
+
+# 题3 爬虫所在目录
+SPIDER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, '题3')
+
+def format_sse(event, data):
+    """格式化一条SSE事件，message 类型省略 event 行"""
+    payload = data if isinstance(data, str) else json.dumps(data, ensure_ascii=False)
+    if event == 'message':
+        return f"data: {payload}\n\n"
+    return f"event: {event}\ndata: {payload}\n\n"
+
+def paced(events):
+    """按数据源给出的间隔依次产出 (event, data)，供独立的流式端点使用"""
+    for event, data, delay in events:
+        if event is not None:
+            yield event, data
+        if delay:
+            time.sleep(delay)
+
+# 以下数据源产出 (event, data, delay)，delay 为产出后等待的秒数，event 为 None 时只等待；
+# 独立端点通过 paced 在请求线程中等待，多路复用连接则交给共享调度器驱动
 
 # 1. 基础文本流式响应
+def text_events():
+    """文本消息数据源"""
+    messages = [
+        "欢迎使用Flask流式API！",
+        "这是第一条消息...",
+        "正在处理您的请求...",
+        "数据正在生成中...",
+        "即将完成...",
+        "流式传输完成！"
+    ]
+    
+    for i, message in enumerate(messages):
+        yield 'message', f"[{i+1}/{len(messages)}] {message}", 1  # 模拟处理时间
+
 @app.route('/stream/text')
+@stream_route
 def stream_text():
     """流式返回文本数据"""
     
     def generate_text():
-        messages = [
-            "欢迎使用Flask流式API！",
-            "这是第一条消息...",
-            "正在处理您的请求...",
-            "数据正在生成中...",
-            "即将完成...",
-            "流式传输完成！"
-        ]
-        
-        for i, message in enumerate(messages):
-            yield f"[{i+1}/{len(messages)}] {message}\n"
-            time.sleep(1)  # 模拟处理时间
+        for _, text in paced(text_events()):
+            yield f"{text}\n"
     
     return Response(
         generate_text(),
@@ -38,21 +171,26 @@ def stream_text():
     )
 
 # 2. JSON流式响应
+def json_events():
+    """JSON消息数据源"""
+    for i in range(10):
+        data = {
+            "id": i + 1,
+            "timestamp": time.time(),
+            "message": f"这是第 {i+1} 条JSON消息",
+            "random_value": random.randint(1, 100),
+            "status": "processing" if i < 9 else "completed"
+        }
+        yield 'message', data, 0.5
+
 @app.route('/stream/json')
+@stream_route
 def stream_json():
     """流式返回JSON数据"""
     
     def generate_json():
-        for i in range(10):
-            data = {
-                "id": i + 1,
-                "timestamp": time.time(),
-                "message": f"这是第 {i+1} 条JSON消息",
-                "random_value": random.randint(1, 100),
-                "status": "processing" if i < 9 else "completed"
-            }
+        for _, data in paced(json_events()):
             yield f"{json.dumps(data, ensure_ascii=False)}\n"
-            time.sleep(0.5)
     
     return Response(
         generate_json(),
@@ -61,34 +199,37 @@ def stream_json():
     )
 
 # 3. Server-Sent Events (SSE) 流式响应
+def sse_events():
+    """SSE事件数据源"""
+    yield 'message', "连接已建立", 0
+    
+    for i in range(20):
+        # 发送不同类型的事件
+        if i % 5 == 0:
+            event_type = "status"
+            data = {"type": "status", "message": f"进度: {i*5}%"}
+        else:
+            event_type = "data"
+            data = {
+                "type": "data",
+                "id": i,
+                "content": f"实时数据 #{i}",
+                "timestamp": datetime.now().strftime("%H:%M:%S")
+            }
+        
+        yield event_type, data, 0.8
+    
+    # 发送结束事件
+    yield 'end', {'message': '流式传输结束'}, 0
+
 @app.route('/stream/sse')
+@stream_route
 def stream_sse():
     """Server-Sent Events 流式响应"""
     
     def generate_sse():
-        yield "data: 连接已建立\n\n"
-        
-        for i in range(20):
-            # 发送不同类型的事件
-            if i % 5 == 0:
-                event_type = "status"
-                data = {"type": "status", "message": f"进度: {i*5}%"}
-            else:
-                event_type = "data"
-                data = {
-                    "type": "data",
-                    "id": i,
-                    "content": f"实时数据 #{i}",
-                    "timestamp": datetime.now().strftime("%H:%M:%S")
-                }
-            
-            yield f"event: {event_type}\n"
-            yield f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
-            time.sleep(0.8)
-        
-        # 发送结束事件
-        yield "event: end\n"
-        yield f"data: {json.dumps({'message': '流式传输结束'}, ensure_ascii=False)}\n\n"
+        for event, data in paced(sse_events()):
+            yield format_sse(event, data)
     
     return Response(
         generate_sse(),
@@ -102,35 +243,39 @@ def stream_sse():
     )
 
 # 4. 模拟聊天机器人流式响应
+def chat_events(message):
+    """聊天机器人回复数据源"""
+    # 模拟AI思考过程
+    thinking_steps = [
+        "正在理解您的问题...",
+        "搜索相关信息...",
+        "组织回答内容...",
+        "生成回复..."
+    ]
+    
+    for step in thinking_steps:
+        yield 'message', {'type': 'thinking', 'content': step}, 0.5
+    
+    # 模拟逐字输出回复
+    response_text = f"您好！您刚才说的是：'{message}'。这是一个Flask流式API演示，我正在逐字为您生成回复。流式响应可以让用户实时看到内容生成过程，提供更好的用户体验。"
+    
+    current_text = ""
+    for char in response_text:
+        current_text += char
+        yield 'message', {'type': 'response', 'content': current_text}, 0.05  # 模拟打字效果
+    
+    # 发送完成信号
+    yield 'message', {'type': 'done', 'content': '回复完成'}, 0
+
 @app.route('/stream/chat')
+@stream_route
 def stream_chat():
     """模拟聊天机器人的流式响应"""
     message = request.args.get('message', '你好')
     
     def generate_chat_response():
-        # 模拟AI思考过程
-        thinking_steps = [
-            "正在理解您的问题...",
-            "搜索相关信息...",
-            "组织回答内容...",
-            "生成回复..."
-        ]
-        
-        for step in thinking_steps:
-            yield f"data: {json.dumps({'type': 'thinking', 'content': step}, ensure_ascii=False)}\n\n"
-            time.sleep(0.5)
-        
-        # 模拟逐字输出回复
-        response_text = f"您好！您刚才说的是：'{message}'。这是一个Flask流式API演示，我正在逐字为您生成回复。流式响应可以让用户实时看到内容生成过程，提供更好的用户体验。"
-        
-        current_text = ""
-        for char in response_text:
-            current_text += char
-            yield f"data: {json.dumps({'type': 'response', 'content': current_text}, ensure_ascii=False)}\n\n"
-            time.sleep(0.05)  # 模拟打字效果
-        
-        # 发送完成信号
-        yield f"data: {json.dumps({'type': 'done', 'content': '回复完成'}, ensure_ascii=False)}\n\n"
+        for event, data in paced(chat_events(message)):
+            yield format_sse(event, data)
     
     return Response(
         generate_chat_response(),
@@ -143,6 +288,7 @@ def stream_chat():
 
 # 5. 文件流式下载
 @app.route('/stream/download')
+@stream_route
 def stream_download():
     """流式下载大文件（模拟）"""
     
@@ -164,29 +310,160 @@ def stream_download():
     )
 
 # 6. 实时日志流
-@app.route('/stream/logs')
-def stream_logs():
-    """模拟实时日志流"""
+# 日志级别按严重程度排序
+LOG_SEVERITY = {"DEBUG": 0, "INFO": 1, "WARNING": 2, "ERROR": 3}
+
+class LogFilter():
+    """
+    日志订阅的服务端过滤条件
+
+    在序列化之前按级别阈值、服务、关键词、采样比例依次过滤；
+    超过每秒事件上限的日志不逐条发送，而是合并成一条 summary 事件，在时间窗口结束时发出。
+    """
     
-    def generate_logs():
-        log_levels = ["INFO", "DEBUG", "WARNING", "ERROR"]
-        services = ["API", "Database", "Cache", "Queue", "Auth"]
+    # 关键词的最大长度
+    MAX_MATCH_LENGTH = 100
+    
+    def __init__(self, min_level=None, services=None, match=None, sample=1.0, max_rate=None):
+        self.min_severity = LOG_SEVERITY[min_level] if min_level else None
+        self.services = services
+        self.match = match
+        self.sample = sample
+        self.max_rate = max_rate
+    
+    @classmethod
+    def from_params(cls, params):
+        """
+        从查询参数构造过滤条件，参数不合法时抛出 ValueError
+        
+        match 按字面子串匹配而不是正则：re 匹配时持有 GIL，一个回溯爆炸的正则会卡住整个进程。
+        """
+        min_level = params.get('level')
+        if min_level:
+            min_level = str(min_level).upper()
+            if min_level not in LOG_SEVERITY:
+                raise ValueError(f"未知的日志级别: {min_level}")
+        
+        services = params.get('service')
+        if services:
+            services = frozenset(s.strip().lower() for s in str(services).split(',') if s.strip())
+        
+        match = params.get('match')
+        if match:
+            match = str(match)
+            if len(match) > cls.MAX_MATCH_LENGTH:
+                raise ValueError(f"match 不能超过 {cls.MAX_MATCH_LENGTH} 个字符")
         
-        for i in range(100):
-            level = random.choice(log_levels)
-            service = random.choice(services)
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        try:
+            sample = float(params.get('sample', 1.0))
+            max_rate = params.get('max_rate')
+            max_rate = int(max_rate) if max_rate else None
+        except (TypeError, ValueError):
+            raise ValueError("sample 和 max_rate 必须是数字")
+        if not 0 < sample <= 1:
+            raise ValueError("sample 必须在 (0, 1] 之间")
+        if max_rate is not None and max_rate < 1:
+            raise ValueError("max_rate 必须大于等于 1")
+        
+        return cls(min_level, services or None, match or None, sample, max_rate)
+    
+    def accepts(self, entry):
+        """判断一条日志是否需要发送"""
+        if self.min_severity is not None and LOG_SEVERITY[entry["level"]] < self.min_severity:
+            return False
+        if self.services is not None and entry["service"].lower() not in self.services:
+            return False
+        if self.match is not None and self.match not in entry["message"]:
+            return False
+        if self.sample < 1 and random.random() >= self.sample:
+            return False
+        return True
+    
+    def apply(self, events):
+        """包装日志数据源；没有任何条件时原样返回"""
+        if (self.min_severity is None and self.services is None and self.match is None
+                and self.sample >= 1 and self.max_rate is None):
+            return events
+        return self._filtered(events)
+    
+    def _filtered(self, events):
+        window_start = time.monotonic()
+        sent = 0
+        suppressed = {}
+        
+        for event, entry, delay in events:
+            # 每条日志（包括随后被丢弃的）都检查时间窗口，窗口结束时立即发出合并事件
+            if self.max_rate is not None:
+                now = time.monotonic()
+                if now - window_start >= 1:
+                    if suppressed:
+                        yield 'summary', self._summary(suppressed), 0
+                        suppressed = {}
+                    window_start = now
+                    sent = 0
             
-            log_entry = {
-                "timestamp": timestamp,
-                "level": level,
-                "service": service,
-                "message": f"这是来自 {service} 服务的 {level} 级别日志消息 #{i+1}",
-                "request_id": f"req_{random.randint(1000, 9999)}"
-            }
+            if not self.accepts(entry):
+                # 丢弃的日志仍然保留其等待时间，保证节奏不变
+                yield None, None, delay
+                continue
+            
+            if self.max_rate is not None:
+                if sent >= self.max_rate:
+                    suppressed[entry["level"]] = suppressed.get(entry["level"], 0) + 1
+                    yield None, None, delay
+                    continue
+                sent += 1
             
-            yield f"data: {json.dumps(log_entry, ensure_ascii=False)}\n\n"
-            time.sleep(random.uniform(0.2, 1.0))  # 随机间隔
+            yield event, entry, delay
+        
+        if suppressed:
+            yield 'summary', self._summary(suppressed), 0
+    
+    def _summary(self, suppressed):
+        return {
+            "type": "summary",
+            "suppressed": sum(suppressed.values()),
+            "levels": suppressed,
+            "max_rate": self.max_rate
+        }
+
+def log_events():
+    """模拟日志数据源"""
+    log_levels = ["INFO", "DEBUG", "WARNING", "ERROR"]
+    services = ["API", "Database", "Cache", "Queue", "Auth"]
+    
+    for i in range(100):
+        level = random.choice(log_levels)
+        service = random.choice(services)
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        
+        log_entry = {
+            "timestamp": timestamp,
+            "level": level,
+            "service": service,
+            "message": f"这是来自 {service} 服务的 {level} 级别日志消息 #{i+1}",
+            "request_id": f"req_{random.randint(1000, 9999)}"
+        }
+        
+        yield 'message', log_entry, random.uniform(0.2, 1.0)  # 随机间隔
+
+@app.route('/stream/logs')
+@stream_route
+def stream_logs():
+    """
+    模拟实时日志流
+    
+    支持查询参数 level（最低级别）、service（逗号分隔的服务）、match（消息中包含的子串）、
+    sample（采样比例）和 max_rate（每秒最多事件数，超出部分合并为 summary 事件）
+    """
+    try:
+        log_filter = LogFilter.from_params(request.args)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    
+    def generate_logs():
+        for event, log_entry in paced(log_filter.apply(log_events())):
+            yield format_sse(event, log_entry)
     
     return Response(
         generate_logs(),
@@ -195,36 +472,407 @@ def stream_logs():
     )
 
 # 7. 数据处理进度流
+@job_manager.register('demo', params={
+    'total': (int, 1, 500),
+    'rounds': (int, 0, 10000),
+    'delay': (float, 0, 0.5)
+})
+def demo_job(job, total=100, rounds=2000, delay=0.1):
+    """演示任务：逐项计算数据摘要并上报进度"""
+    digest = b''
+    for i in range(1, total + 1):
+        for _ in range(rounds):
+            digest = hashlib.sha256(digest + i.to_bytes(4, 'big')).digest()
+        job.report(i, total, f"正在处理第 {i} 项，共 {total} 项")
+        if delay:
+            time.sleep(delay)
+    return {"digest": digest.hex()}
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """提交后台任务，返回任务ID"""
+    payload = request.get_json(silent=True) or {}
+    if not isinstance(payload, dict):
+        return {"error": "请求体必须是 JSON 对象"}, 400
+    kind = payload.get('type', 'demo')
+    if not isinstance(kind, str):
+        return {"error": "type 必须是字符串", "types": job_manager.kinds}, 400
+    params = payload.get('params') or {}
+    if not isinstance(params, dict):
+        return {"error": "params 必须是对象"}, 400
+    
+    try:
+        job = job_manager.submit(kind, params, client=request.remote_addr)
+    except KeyError:
+        return {"error": f"未知的任务类型: {kind}", "types": job_manager.kinds}, 400
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    except AdmissionRejected as e:
+        return {"error": e.message}, e.status, {"Retry-After": str(e.retry_after)}
+    
+    return {
+        "job_id": job.id,
+        "status_url": f"/jobs/{job.id}",
+        "progress_url": f"/stream/progress/{job.id}"
+    }, 202
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """查询任务当前状态"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return {"error": "任务不存在或已过期"}, 404
+    return job.snapshot()
+
+def progress_response(job):
+    """把任务进度转成SSE流，慢速订阅者只会收到最新进度"""
+    subscription = job.feed.subscribe(latest_only=True)
+    
+    def generate_progress():
+        try:
+            while True:
+                data = subscription.get(timeout=15)
+                if data is END:
+                    break
+                if data is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"data: {data}\n\n"
+        finally:
+            subscription.cancel()
+    
+    return Response(
+        generate_progress(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache'}
+    )
+
+@app.route('/stream/progress/<job_id>')
+@stream_route
+def stream_job_progress(job_id):
+    """订阅指定任务的实时进度"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return {"error": "任务不存在或已过期"}, 404
+    return progress_response(job)
+
+_demo_job_lock = threading.Lock()
+_demo_job = None
+
+def attach_demo_job():
+    """附加到正在运行的共享演示任务，没有时提交新的一个"""
+    global _demo_job
+    with _demo_job_lock:
+        if _demo_job is None or _demo_job.finished:
+            _demo_job = job_manager.submit('demo', {"total": 100})
+        return _demo_job
+
 @app.route('/stream/progress')
+@stream_route
 def stream_progress():
-    """模拟数据处理进度"""
+    """订阅共享演示任务的进度，所有观看者共用同一个任务"""
+    try:
+        job = attach_demo_job()
+    except AdmissionRejected as e:
+        return {"error": e.message}, e.status, {"Retry-After": str(e.retry_after)}
+    return progress_response(job)
+
+# 8. 爬虫文章实时流
+class CrawlRun():
+    """在后台线程中运行一轮爬虫，把抓取到的文章广播给所有观看者"""
     
-    def generate_progress():
-        total_items = 100
+    def __init__(self, limit):
+        self.limit = limit
+        self.feed = Broadcast()
+        self.thread = threading.Thread(target=self._run, name='spider-crawl', daemon=True)
+        self.thread.start()
+    
+    @property
+    def finished(self):
+        return self.feed.closed
+    
+    def _publish(self, event, data):
+        # 每条事件只序列化一次，所有观看者共享：SSE 使用 data 部分，NDJSON 使用整行记录
+        line = json.dumps({"event": event, "data": data}, ensure_ascii=False) + "\n"
+        self.feed.publish((event, json.dumps(data, ensure_ascii=False), line))
+    
+    def _run(self):
+        count = 0
+        spider = None
+        try:
+            if SPIDER_DIR not in sys.path:
+                sys.path.insert(0, SPIDER_DIR)
+            from spider import Spider
+            
+            spider = Spider()
+            for article in spider.crawl(limit=self.limit):
+                count += 1
+                self._publish('article', article)
+            spider.save_to_csv()
+            self._publish('end', {'message': '抓取完成', 'count': count})
+        except Exception as e:
+            self._publish('end', {'message': f'抓取出错: {e}', 'count': count})
+        finally:
+            if spider is not None:
+                try:
+                    spider.browser.quit()
+                except Exception:
+                    pass
+            self.feed.close()
+
+_crawl_lock = threading.Lock()
+_crawl_run = None
+
+# NDJSON 模式下的心跳也是一条完整的记录
+NDJSON_HEARTBEAT = json.dumps({"event": "heartbeat"}) + "\n"
+
+# 每轮抓取的文章数，匿名请求也能启动抓取，必须限制在较小范围内
+DEFAULT_CRAWL_LIMIT = 10
+MAX_CRAWL_LIMIT = 50
+
+def parse_crawl_limit(value):
+    """解析抓取篇数并截断到 1..MAX_CRAWL_LIMIT，不是整数时抛出 ValueError"""
+    if value is None or value == '':
+        return DEFAULT_CRAWL_LIMIT
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError("limit 必须是整数")
+    return min(max(int(value), 1), MAX_CRAWL_LIMIT)
+
+def attach_crawl(limit):
+    """附加到正在进行的抓取，没有进行中的抓取时启动新的一轮"""
+    global _crawl_run
+    with _crawl_lock:
+        if _crawl_run is None or _crawl_run.finished:
+            _crawl_run = CrawlRun(limit)
+        return _crawl_run
+
+@app.route('/stream/articles')
+@stream_route
+def stream_articles():
+    """实时推送爬虫抓取到的文章，支持 NDJSON 和 SSE 两种格式"""
+    try:
+        limit = parse_crawl_limit(request.args.get('limit'))
+    except ValueError:
+        return {"error": "limit 必须是整数"}, 400
+    use_sse = request.args.get('format', 'ndjson') == 'sse'
+    
+    # 新加入的观看者会先收到本轮已经抓取到的文章
+    subscription = attach_crawl(limit).feed.subscribe()
+    
+    def generate_articles():
+        try:
+            while True:
+                item = subscription.get(timeout=15)
+                if item is END:
+                    break
+                if item is None:
+                    # 心跳，保持连接并及时发现客户端断开
+                    yield ": keep-alive\n\n" if use_sse else NDJSON_HEARTBEAT
+                    continue
+                
+                event, data, line = item
+                if use_sse:
+                    yield f"event: {event}\ndata: {data}\n\n"
+                else:
+                    yield line
+        finally:
+            subscription.cancel()
+    
+    return Response(
+        generate_articles(),
+        mimetype='text/event-stream' if use_sse else 'application/x-ndjson',
+        headers={'Cache-Control': 'no-cache'}
+    )
+
+# 9. 多路复用流
+# 所有多路复用连接共用一个调度线程驱动定时数据源
+stream_scheduler = Scheduler()
+
+MUX_SOURCES = {
+    'text': lambda params: text_events(),
+    'json': lambda params: json_events(),
+    'sse': lambda params: sse_events(),
+    'chat': lambda params: chat_events(params.get('message', '你好')),
+    'logs': lambda params: LogFilter.from_params(params).apply(log_events()),
+}
+
+class ChannelSink():
+    """把一个频道的事件打上频道标签，转发到多路复用连接的发送队列"""
+    
+    def __init__(self, connection, channel, serialize):
+        self.connection = connection
+        self.channel = channel
+        self.serialize = serialize
+    
+    def push(self, item):
+        if item is END:
+            self.connection.channel_finished(self.channel, self)
+            return
         
-        for i in range(total_items + 1):
-            progress = {
-                "current": i,
-                "total": total_items,
-                "percentage": round((i / total_items) * 100, 2),
-                "status": "processing" if i < total_items else "completed",
-                "message": f"正在处理第 {i} 项，共 {total_items} 项"
-            }
+        event, data = ('message', item) if isinstance(item, str) else item[:2]
+        if self.serialize:
+            data = json.dumps(data, ensure_ascii=False)
+        self.connection.outbox.push((self.channel, event, data))
+
+class MuxConnection():
+    """一个客户端连接，承载任意多个逻辑频道"""
+    
+    def __init__(self):
+        self.id = uuid.uuid4().hex[:12]
+        self.outbox = Subscription()
+        self.channels = {}  # 频道 -> (sink, 取消订阅函数)
+        self._lock = threading.Lock()
+        # 串行化订阅和取消订阅，避免并发订阅同一频道时旧的 sink 没有被取消
+        self._subscribe_lock = threading.Lock()
+    
+    def subscribe(self, channel, params=None):
+        """订阅频道，未知频道或任务不存在时抛出 KeyError，参数不合法时抛出 ValueError"""
+        with self._subscribe_lock:
+            self._subscribe(channel, params or {})
+    
+    def _subscribe(self, channel, params):
+        name, _, arg = channel.partition(':')
+        
+        if name in MUX_SOURCES:
+            # 参数不合法时在这里抛出，此时已订阅的同名频道和登记表都不受影响
+            source = MUX_SOURCES[name](params)
+            self._unsubscribe(channel)
+            sink = ChannelSink(self, channel, serialize=True)
+            # 先登记频道，数据源立即结束时也能正确清理
+            self._register(channel, sink, None)
+            task = stream_scheduler.start(source, sink)
+            self._register(channel, sink, task.cancel)
+            return
+        
+        if name == 'progress':
+            job = job_manager.get(arg)
+            if job is None:
+                raise KeyError(channel)
+            feed = job.feed
+        elif name == 'articles':
+            feed = attach_crawl(parse_crawl_limit(params.get('limit'))).feed
+        else:
+            raise KeyError(channel)
+        
+        self._unsubscribe(channel)
+        sink = ChannelSink(self, channel, serialize=False)
+        self._register(channel, sink, lambda: feed.unsubscribe(sink))
+        feed.subscribe(sink)
+    
+    def _register(self, channel, sink, cancel):
+        with self._lock:
+            self.channels[channel] = (sink, cancel)
+    
+    def unsubscribe(self, channel):
+        """取消订阅频道，返回该频道此前是否存在"""
+        with self._subscribe_lock:
+            return self._unsubscribe(channel)
+    
+    def _unsubscribe(self, channel):
+        with self._lock:
+            entry = self.channels.pop(channel, None)
+        if entry is None:
+            return False
+        if entry[1] is not None:
+            entry[1]()
+        return True
+    
+    def channel_finished(self, channel, sink):
+        """频道的数据源结束"""
+        with self._lock:
+            entry = self.channels.get(channel)
+            if entry is None or entry[0] is not sink:
+                return
+            del self.channels[channel]
+        self.outbox.push((channel, 'closed', 'null'))
+    
+    def close(self):
+        """连接断开时取消全部频道"""
+        for channel in list(self.channels):
+            self.unsubscribe(channel)
+
+_mux_lock = threading.Lock()
+_mux_connections = {}
+
+def get_mux_connection(conn_id):
+    with _mux_lock:
+        return _mux_connections.get(conn_id)
+
+@app.route('/stream/mux')
+@stream_route
+def stream_mux():
+    """单连接多路复用SSE流，每条消息带频道标签"""
+    connection = MuxConnection()
+    initial = [c for c in request.args.get('channels', '').split(',') if c]
+    
+    def generate_mux():
+        # 在生成器内登记连接，生成器从未启动（如 HEAD 请求）时不会留下登记项
+        with _mux_lock:
+            _mux_connections[connection.id] = connection
+        try:
+            yield format_sse('mux', {'conn_id': connection.id})
+            for channel in initial:
+                try:
+                    connection.subscribe(channel)
+                except KeyError:
+                    connection.outbox.push((channel, 'closed', '{"reason": "unknown channel"}'))
             
-            yield f"data: {json.dumps(progress, ensure_ascii=False)}\n\n"
-            time.sleep(0.1)
+            while True:
+                item = connection.outbox.get(timeout=15)
+                if item is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                channel, event, data = item
+                yield f'data: {{"channel": {json.dumps(channel, ensure_ascii=False)}, "event": "{event}", "data": {data}}}\n\n'
+        finally:
+            with _mux_lock:
+                _mux_connections.pop(connection.id, None)
+            connection.close()
     
     return Response(
-        generate_progress(),
+        generate_mux(),
         mimetype='text/event-stream',
         headers={'Cache-Control': 'no-cache'}
     )
 
-# 8. 演示页面
-@app.route('/')
-def demo_page():
-    """演示页面"""
-    html_template = """
+@app.route('/stream/mux/<conn_id>/subscribe', methods=['POST'])
+def mux_subscribe(conn_id):
+    """为多路复用连接订阅频道"""
+    connection = get_mux_connection(conn_id)
+    if connection is None:
+        return {"error": "连接不存在"}, 404
+    
+    payload = request.get_json(silent=True) or {}
+    if not isinstance(payload, dict) or not isinstance(payload.get('channel', ''), str):
+        return {"error": "请求体必须是 JSON 对象，channel 必须是字符串"}, 400
+    channel = payload.get('channel', '')
+    params = payload.get('params') or {}
+    if not isinstance(params, dict):
+        return {"error": "params 必须是对象"}, 400
+    
+    try:
+        connection.subscribe(channel, params)
+    except (KeyError, ValueError):
+        return {"error": f"无法订阅频道: {channel}", "channels": sorted(MUX_SOURCES) + ['articles', 'progress:<job_id>']}, 400
+    return {"channel": channel, "subscribed": True}
+
+@app.route('/stream/mux/<conn_id>/unsubscribe', methods=['POST'])
+def mux_unsubscribe(conn_id):
+    """为多路复用连接取消订阅频道"""
+    connection = get_mux_connection(conn_id)
+    if connection is None:
+        return {"error": "连接不存在"}, 404
+    
+    payload = request.get_json(silent=True) or {}
+    if not isinstance(payload, dict) or not isinstance(payload.get('channel', ''), str):
+        return {"error": "请求体必须是 JSON 对象，channel 必须是字符串"}, 400
+    channel = payload.get('channel', '')
+    if not connection.unsubscribe(channel):
+        return {"error": f"未订阅频道: {channel}"}, 404
+    return {"channel": channel, "subscribed": False}
+
+# 10. 演示页面
+DEMO_PAGE_TEMPLATE = """
     <!DOCTYPE html>
     <html>
     <head>
@@ -323,6 +971,11 @@ def demo_page():
                 font-size: 13px;
                 line-height: 1.4;
             }
+            #output .line {
+                white-space: pre-wrap;
+                word-break: break-all;
+            }
+            #output .line-time { color: #888; }
             .stats {
                 display: flex;
                 justify-content: space-around;
@@ -355,7 +1008,7 @@ def demo_page():
             <div class="content">
                 <div class="stats">
                     <div class="stat-item">
-                        <div class="stat-number">7</div>
+                        <div class="stat-number">9</div>
                         <div class="stat-label">API端点</div>
                     </div>
                     <div class="stat-item">
@@ -406,6 +1059,7 @@ def demo_page():
                     <p>模拟实时日志数据流，展示系统监控场景</p>
                     <div class="test-area">
                         <button onclick="testSSE('/stream/logs')">📋 查看日志流</button>
+                        <button onclick="testSSE('/stream/logs?level=ERROR&max_rate=5')">🚨 仅看ERROR</button>
                     </div>
                 </div>
                 
@@ -425,6 +1079,29 @@ def demo_page():
                     </div>
                 </div>
                 
+                <div class="endpoint">
+                    <h3>🕷️ 8. 爬虫文章实时流</h3>
+                    <p>在后台运行题3爬虫，每抓取到一篇文章立即推送，多个页面可同时观看同一轮抓取</p>
+                    <div class="test-area">
+                        <button onclick="testEndpoint('/stream/articles')">🕷️ 查看NDJSON</button>
+                        <button onclick="testSSE('/stream/articles?format=sse')">⚡ 查看SSE</button>
+                    </div>
+                </div>
+                
+                <div class="endpoint">
+                    <h3>🔀 9. 多路复用流</h3>
+                    <p>一个连接同时承载多个频道，按频道随时订阅或取消订阅</p>
+                    <div class="test-area">
+                        <label><input type="checkbox" class="mux-channel" value="logs" onchange="toggleMuxChannel(this)" checked> 日志</label>
+                        <label><input type="checkbox" class="mux-channel" value="sse" onchange="toggleMuxChannel(this)" checked> SSE事件</label>
+                        <label><input type="checkbox" class="mux-channel" value="json" onchange="toggleMuxChannel(this)"> JSON</label>
+                        <label><input type="checkbox" class="mux-channel" value="chat" onchange="toggleMuxChannel(this)"> 聊天</label>
+                        <br>
+                        <button onclick="openMux()">🔀 打开连接</button>
+                        <button onclick="closeMux()">⛔ 关闭连接</button>
+                    </div>
+                </div>
+                
                 <div class="test-area">
                     <h3>🖥️ 输出控制台</h3>
                     <button onclick="clearOutput()">🗑️ 清空输出</button>
@@ -438,28 +1115,109 @@ def demo_page():
             const output = document.getElementById('output');
             let outputVisible = true;
             
+            // 控制台最多保留的行数，超出后复用最早的行节点
+            const MAX_LINES = 1000;
+            const colors = {
+                normal: '#00ff00',
+                info: '#00bfff',
+                warning: '#ffa500',
+                error: '#ff4444',
+                success: '#00ff88'
+            };
+            // 等待下一帧渲染的新行，以及内容有变化的已有行
+            let pendingLines = [];
+            const dirtyLines = new Set();
+            let flushScheduled = false;
+            
             function clearOutput() {
-                output.innerHTML = '';
+                pendingLines = [];
+                dirtyLines.clear();
+                output.textContent = '';
             }
             
             function toggleOutput() {
                 outputVisible = !outputVisible;
                 output.style.display = outputVisible ? 'block' : 'none';
+                if (outputVisible) {
+                    output.scrollTop = output.scrollHeight;
+                }
+            }
+            
+            function scheduleFlush() {
+                if (!flushScheduled) {
+                    flushScheduled = true;
+                    requestAnimationFrame(flushOutput);
+                }
+            }
+            
+            function createLineNode() {
+                const node = document.createElement('div');
+                node.className = 'line';
+                node.timeSpan = document.createElement('span');
+                node.timeSpan.className = 'line-time';
+                node.textSpan = document.createElement('span');
+                node.append(node.timeSpan, ' ', node.textSpan);
+                return node;
             }
             
+            function renderLine(node, line) {
+                if (node.line && node.line !== line) {
+                    node.line.node = null;
+                }
+                node.line = line;
+                line.node = node;
+                node.timeSpan.textContent = `[${line.time}]`;
+                node.textSpan.textContent = line.text;
+                node.textSpan.style.color = line.color;
+            }
+            
+            // 每帧最多一次DOM更新：追加新行、刷新变化的行、滚动到底部
+            function flushOutput() {
+                flushScheduled = false;
+                
+                const start = Math.max(0, pendingLines.length - MAX_LINES);
+                for (let i = start; i < pendingLines.length; i++) {
+                    const node = output.childElementCount >= MAX_LINES ? output.firstElementChild : createLineNode();
+                    renderLine(node, pendingLines[i]);
+                    output.appendChild(node);
+                }
+                pendingLines = [];
+                
+                dirtyLines.forEach(function(line) {
+                    if (line.node) {
+                        renderLine(line.node, line);
+                    }
+                });
+                dirtyLines.clear();
+                
+                if (outputVisible) {
+                    output.scrollTop = output.scrollHeight;
+                }
+            }
+            
+            // 追加一行输出，返回的行对象可以交给 updateOutput 原地更新
             function appendOutput(text, type = 'normal') {
-                const timestamp = new Date().toLocaleTimeString();
-                const colors = {
-                    normal: '#00ff00',
-                    info: '#00bfff',
-                    warning: '#ffa500',
-                    error: '#ff4444',
-                    success: '#00ff88'
+                const line = {
+                    time: new Date().toLocaleTimeString(),
+                    text: text,
+                    color: colors[type] || colors.normal,
+                    node: null
                 };
-                
-                const color = colors[type] || colors.normal;
-                output.innerHTML += `<span style="color: #888">[${timestamp}]</span> <span style="color: ${color}">${text}</span>\\n`;
-                output.scrollTop = output.scrollHeight;
+                pendingLines.push(line);
+                // 页面在后台时不会触发动画帧，这里限制积压的行数
+                if (pendingLines.length > MAX_LINES * 2) {
+                    pendingLines = pendingLines.slice(-MAX_LINES);
+                }
+                scheduleFlush();
+                return line;
+            }
+            
+            function updateOutput(line, text) {
+                line.text = text;
+                if (line.node) {
+                    dirtyLines.add(line);
+                }
+                scheduleFlush();
             }
             
             async function testEndpoint(url) {
@@ -506,6 +1264,14 @@ def demo_page():
                     appendOutput(`📦 数据: ${event.data}`, 'info');
                 });
                 
+                eventSource.addEventListener('summary', function(event) {
+                    appendOutput(`📉 超出速率上限已合并: ${event.data}`, 'warning');
+                });
+                
+                eventSource.addEventListener('article', function(event) {
+                    appendOutput(`📰 文章: ${event.data}`, 'info');
+                });
+                
                 eventSource.addEventListener('end', function(event) {
                     appendOutput(`🏁 结束: ${event.data}`, 'success');
                     eventSource.close();
@@ -533,20 +1299,19 @@ def demo_page():
                 appendOutput(`💬 发送消息: ${message}`, 'info');
                 
                 const eventSource = new EventSource(url);
-                let currentResponse = '';
+                let responseLine = null;
                 
                 eventSource.onmessage = function(event) {
                     const data = JSON.parse(event.data);
                     if (data.type === 'thinking') {
                         appendOutput(`🤔 ${data.content}`, 'warning');
                     } else if (data.type === 'response') {
-                        // 更新当前回复
-                        currentResponse = data.content;
-                        // 清除之前的回复行，显示最新的完整回复
-                        const lines = output.innerHTML.split('\\n');
-                        const filteredLines = lines.filter(line => !line.includes('🤖'));
-                        output.innerHTML = filteredLines.join('\\n');
-                        appendOutput(`🤖 ${currentResponse}`);
+                        // 回复只占一行，原地更新为最新的完整内容
+                        if (responseLine) {
+                            updateOutput(responseLine, `🤖 ${data.content}`);
+                        } else {
+                            responseLine = appendOutput(`🤖 ${data.content}`);
+                        }
                     } else if (data.type === 'done') {
                         appendOutput(`✅ ${data.content}`, 'success');
                         eventSource.close();
@@ -559,6 +1324,67 @@ def demo_page():
                 };
             }
             
+            let muxSource = null;
+            let muxId = null;
+            
+            function muxRequest(action, channel) {
+                const params = channel === 'chat' ? { message: document.getElementById('chatInput').value } : {};
+                return fetch(`/stream/mux/${muxId}/${action}`, {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify({ channel: channel, params: params })
+                });
+            }
+            
+            function openMux() {
+                if (muxSource) {
+                    return;
+                }
+                clearOutput();
+                appendOutput('🔀 打开多路复用连接: /stream/mux', 'info');
+                
+                muxSource = new EventSource('/stream/mux');
+                
+                muxSource.addEventListener('mux', function(event) {
+                    muxId = JSON.parse(event.data).conn_id;
+                    appendOutput(`🔗 连接ID: ${muxId}`, 'success');
+                    document.querySelectorAll('.mux-channel').forEach(function(box) {
+                        if (box.checked) {
+                            muxRequest('subscribe', box.value);
+                        }
+                    });
+                });
+                
+                muxSource.onmessage = function(event) {
+                    const message = JSON.parse(event.data);
+                    if (message.event === 'closed') {
+                        appendOutput(`🏁 [${message.channel}] 频道结束`, 'warning');
+                    } else {
+                        appendOutput(`[${message.channel}] ${message.event}: ${JSON.stringify(message.data)}`);
+                    }
+                };
+                
+                muxSource.onerror = function() {
+                    appendOutput('❌ 多路复用连接错误', 'error');
+                    closeMux();
+                };
+            }
+            
+            function closeMux() {
+                if (muxSource) {
+                    muxSource.close();
+                    appendOutput('⛔ 多路复用连接已关闭', 'info');
+                }
+                muxSource = null;
+                muxId = null;
+            }
+            
+            function toggleMuxChannel(box) {
+                if (muxId) {
+                    muxRequest(box.checked ? 'subscribe' : 'unsubscribe', box.value);
+                }
+            }
+            
             // 页面加载完成后的欢迎信息
             window.onload = function() {
                 appendOutput('🎉 欢迎使用Flask流式API演示！', 'success');
@@ -568,7 +1394,30 @@ def demo_page():
     </body>
     </html>
     """
-    return render_template_string(html_template)
+
+# 启动时渲染并压缩一次，之后每次请求只做缓存协商
+demo_page_asset = StaticAsset(
+    app.jinja_env.from_string(DEMO_PAGE_TEMPLATE).render(),
+    'text/html',
+    cache_control='no-cache'
+)
+
+@app.route('/')
+def demo_page():
+    """演示页面"""
+    return demo_page_asset.response()
+
+# 静态资源，同样在启动时预压缩
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+static_assets = load_static_dir(STATIC_DIR)
+
+@app.route('/static/<path:filename>')
+def static_file(filename):
+    """预压缩的静态资源"""
+    asset = static_assets.get(filename)
+    if asset is None:
+        return {"error": "文件不存在"}, 404
+    return asset.response()
 
 # 健康检查端点
 @app.route('/health')
@@ -581,10 +1430,40 @@ def health_check():
         "version": "1.0.0"
     }
 
+# 指标端点
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus 文本格式的运行指标"""
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+# 剖析结果，仅限管理员
+@app.route('/debug/profiles')
+def list_profiles():
+    """最近的剖析结果列表"""
+    if not profiler.is_admin(request):
+        return {"error": "需要管理令牌"}, 403
+    return {"profiles": profiler.list()}
+
+@app.route('/debug/profiles/<profile_id>')
+def download_profile(profile_id):
+    """下载折叠栈文件，可直接交给 flamegraph.pl 或 speedscope"""
+    if not profiler.is_admin(request):
+        return {"error": "需要管理令牌"}, 403
+    info = profiler.get(profile_id)
+    if info is None:
+        return {"error": "剖析结果不存在"}, 404
+    with open(os.path.join(profiler.directory, info["file"]), 'r', encoding='utf-8') as f:
+        return Response(
+            f.read(),
+            mimetype='text/plain',
+            headers={'Content-Disposition': f'attachment; filename={info["file"]}'}
+        )
+
 if __name__ == "__main__":
     print("🚀 启动Flask流式API演示服务器...")
     print("📱 访问 http://localhost:5000 查看演示页面")
     print("🔧 健康检查: http://localhost:5000/health")
+    print("📊 运行指标: http://localhost:5000/metrics")
     print("⚡ 服务器支持热重载，修改代码后自动重启")
     
     app.run(
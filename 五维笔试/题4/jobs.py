@@ -0,0 +1,185 @@
+"""
+后台任务执行器
+任务在线程池中运行，进度通过广播推送给所有订阅者
+"""
+
+import json
+import math
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from admission import AdmissionRejected
+from stream_hub import Broadcast
+
+
+class Job():
+    """一个后台任务及其进度"""
+
+    def __init__(self, kind, params, client=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.params = params
+        self.client = client
+        self.status = 'queued'
+        self.current = 0
+        self.total = 0
+        self.message = '等待执行...'
+        self.result = None
+        self.created_at = time.time()
+        self.finished_at = None
+        # 只保留最新的进度，新订阅者立即看到当前状态
+        self.feed = Broadcast(history=1)
+
+    @property
+    def finished(self):
+        return self.status in ('completed', 'failed')
+
+    def snapshot(self):
+        """当前进度"""
+        data = {
+            "job_id": self.id,
+            "type": self.kind,
+            "current": self.current,
+            "total": self.total,
+            "percentage": round((self.current / self.total) * 100, 2) if self.total else 0,
+            "status": self.status,
+            "message": self.message
+        }
+        if self.result is not None:
+            data["result"] = self.result
+        return data
+
+    def _publish(self):
+        # 每次进度变化只序列化一次，与订阅者数量无关
+        self.feed.publish(json.dumps(self.snapshot(), ensure_ascii=False))
+
+    def report(self, current, total=None, message=None):
+        """由任务函数调用，上报进度"""
+        self.current = current
+        if total is not None:
+            self.total = total
+        if message is not None:
+            self.message = message
+        self._publish()
+
+
+class JobManager():
+    """
+    任务管理器
+
+    通过 register 注册任务类型，submit 提交后在线程池中执行；
+    未结束的任务总数不超过 max_pending，单个客户端不超过 max_per_client；
+    已结束的任务保留 retention 秒后清理。
+    """
+
+    def __init__(self, max_workers=4, retention=600, max_pending=16, max_per_client=4, retry_after=5):
+        self.max_workers = max_workers
+        self.retention = retention
+        self.max_pending = max_pending
+        self.max_per_client = max_per_client
+        self.retry_after = retry_after
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._handlers = {}
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def register(self, kind, params=None):
+        """
+        注册任务类型的装饰器，任务函数签名为 handler(job, **params)
+
+        params 为允许的参数表 {参数名: (类型, 最小值, 最大值)}，超出范围的值会被截断到边界，
+        未列出的参数一律拒绝。
+        """
+        def decorator(func):
+            self._handlers[kind] = (func, params or {})
+            return func
+        return decorator
+
+    @staticmethod
+    def _clean_params(spec, params):
+        """按参数表校验并截断参数，不合法时抛出 ValueError"""
+        cleaned = {}
+        for name, value in params.items():
+            if name not in spec:
+                raise ValueError(f"不支持的参数: {name}")
+            kind, low, high = spec[name]
+            if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+                raise ValueError(f"参数 {name} 必须是数字")
+            try:
+                value = float(value)
+            except ValueError:
+                raise ValueError(f"参数 {name} 必须是数字")
+            if not math.isfinite(value):
+                raise ValueError(f"参数 {name} 必须是有限数值")
+            cleaned[name] = kind(min(max(value, low), high))
+        return cleaned
+
+    @property
+    def kinds(self):
+        return sorted(self._handlers)
+
+    def submit(self, kind, params=None, client=None):
+        """
+        提交任务
+
+        未知的任务类型抛出 KeyError，参数不合法抛出 ValueError，
+        队列已满或客户端未结束的任务过多时抛出 AdmissionRejected。
+        """
+        handler, spec = self._handlers[kind]
+        job = Job(kind, self._clean_params(spec, params or {}), client)
+        with self._lock:
+            self._purge()
+            pending = [other for other in self._jobs.values() if not other.finished]
+            if len(pending) >= self.max_pending:
+                raise AdmissionRejected(503, "任务队列已满，请稍后重试", self.retry_after)
+            if client is not None and sum(1 for other in pending if other.client == client) >= self.max_per_client:
+                raise AdmissionRejected(429, "该客户端未完成的任务过多", self.retry_after)
+            self._jobs[job.id] = job
+        job._publish()
+        self._executor.submit(self._run, job, handler)
+        return job
+
+    def get(self, job_id):
+        """按ID查找任务，不存在或已过期时返回 None"""
+        with self._lock:
+            self._purge()
+            return self._jobs.get(job_id)
+
+    def stats(self):
+        """线程池与任务数量统计"""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return {
+            "workers": self.max_workers,
+            "running": sum(1 for job in jobs if job.status == 'running'),
+            "queued": sum(1 for job in jobs if job.status == 'queued'),
+            "retained": len(jobs)
+        }
+
+    def _purge(self):
+        """清理超过保留时间的已结束任务，调用方需持有锁"""
+        deadline = time.time() - self.retention
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished and job.finished_at < deadline]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _run(self, job, handler):
+        job.status = 'running'
+        job.message = '开始执行...'
+        job._publish()
+        try:
+            job.result = handler(job, **job.params)
+            job.current = job.total
+            job.message = '任务完成'
+            status = 'completed'
+        except Exception as e:
+            job.message = f'任务失败: {e}'
+            status = 'failed'
+        # 先记录结束时间再更新状态，避免清理线程看到没有结束时间的已结束任务
+        job.finished_at = time.time()
+        job.status = status
+        job._publish()
+        job.feed.close()
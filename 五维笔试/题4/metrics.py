@@ -0,0 +1,203 @@
+"""
+轻量级指标采集，输出 Prometheus 文本格式
+写入路径只操作当前线程自己的分片，不加锁；采集时再汇总所有线程的分片
+"""
+
+import bisect
+import itertools
+import threading
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+def _format_value(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _ShardedMetric():
+    """
+    按线程分片存储的指标
+
+    每个线程持有自己的 {标签值: [数值...]} 字典，写入和登记分片都无需加锁；
+    已结束线程的分片在采集时、以及每登记 FOLD_EVERY 个新分片时并入 _retired，
+    分片数量不超过存活线程数加 FOLD_EVERY。
+    """
+
+    type_name = 'untyped'
+    FOLD_EVERY = 256
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards = []
+        self._retired = {}
+        self._registrations = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            # list.append 和 next(count) 在 GIL 下都是原子操作，每个请求线程首次写入时不加锁
+            self._shards.append((threading.current_thread(), shard))
+            if next(self._registrations) % self.FOLD_EVERY == 0:
+                with self._lock:
+                    self._fold_dead()
+            return shard
+
+    def _new_value(self):
+        return [0]
+
+    @staticmethod
+    def _merge(target, key, value):
+        current = target.get(key)
+        if current is None:
+            target[key] = list(value)
+        else:
+            for i, v in enumerate(value):
+                current[i] += v
+
+    def _fold_dead(self):
+        """把已结束线程的分片并入 _retired，调用方需持有锁"""
+        # 原地删除而不是重建列表，不会丢失其他线程同时登记的分片
+        for entry in list(self._shards):
+            thread, shard = entry
+            if not thread.is_alive():
+                self._shards.remove(entry)
+                for key, value in list(shard.items()):
+                    self._merge(self._retired, key, value)
+
+    def _totals(self):
+        """汇总所有线程的分片"""
+        with self._lock:
+            self._fold_dead()
+            totals = {}
+            for key, value in self._retired.items():
+                self._merge(totals, key, value)
+            for _, shard in list(self._shards):
+                for key, value in list(shard.items()):
+                    self._merge(totals, key, list(value))
+        return totals
+
+    def _samples(self):
+        for labels, value in sorted(self._totals().items()):
+            yield self.name, self.labelnames, labels, value[0]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        for name, labelnames, labels, value in self._samples():
+            lines.append(f"{name}{_format_labels(labelnames, labels)} {_format_value(value)}")
+        return '\n'.join(lines)
+
+
+class Counter(_ShardedMetric):
+    """只增不减的计数器"""
+
+    type_name = 'counter'
+
+    def inc(self, *labels, amount=1):
+        shard = self._shard()
+        value = shard.get(labels)
+        if value is None:
+            shard[labels] = [amount]
+        else:
+            value[0] += amount
+
+
+class Gauge(Counter):
+    """可增可减的当前值"""
+
+    type_name = 'gauge'
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_ShardedMetric):
+    """分桶统计的分布，每个分片保存 [各桶计数..., 总和, 总数]"""
+
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labels):
+        shard = self._shard()
+        counts = shard.get(labels)
+        if counts is None:
+            counts = shard[labels] = [0] * (len(self.buckets) + 3)
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-2] += value
+        counts[-1] += 1
+
+    def _samples(self):
+        labelnames = self.labelnames + ('le',)
+        for labels, counts in sorted(self._totals().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield f"{self.name}_bucket", labelnames, labels + (_format_value(float(bound)),), cumulative
+            yield f"{self.name}_bucket", labelnames, labels + ('+Inf',), counts[-1]
+            yield f"{self.name}_sum", self.labelnames, labels, counts[-2]
+            yield f"{self.name}_count", self.labelnames, labels, counts[-1]
+
+
+class CallbackGauge():
+    """采集时调用函数取值的指标，函数返回 {标签值元组: 数值}"""
+
+    type_name = 'gauge'
+
+    def __init__(self, name, documentation, func, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.func = func
+        self.labelnames = tuple(labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        for labels, value in sorted(self.func().items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return '\n'.join(lines)
+
+
+class MetricsRegistry():
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._add(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._add(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name, documentation, func, labelnames=()):
+        return self._add(CallbackGauge(name, documentation, func, labelnames))
+
+    def render(self):
+        """输出 Prometheus 文本格式"""
+        return '\n'.join(metric.render() for metric in self._metrics) + '\n'
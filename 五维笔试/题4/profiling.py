@@ -0,0 +1,187 @@
+"""
+按需采样的请求性能剖析
+在流的整个生命周期内定时采集请求线程的调用栈，保存为火焰图可用的折叠栈格式
+"""
+
+import hmac
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+
+
+class StackSampler(threading.Thread):
+    """定时采集目标线程调用栈的后台线程"""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(name='profile-sampler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._labels = {}
+        self._stop_event = threading.Event()
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            # 折叠栈格式以分号分隔帧，帧名中不能出现分号
+            label = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(';', ':')
+            self._labels[code] = label
+        return label
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                break
+            stack = []
+            while frame is not None:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            stack.reverse()
+            self.stacks[';'.join(stack)] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class ProfileSession():
+    """一次请求的剖析"""
+
+    def __init__(self, profiler, route):
+        self.profiler = profiler
+        self.id = uuid.uuid4().hex[:12]
+        self.route = route
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self._sampler = StackSampler(threading.get_ident(), profiler.interval)
+        self._sampler.start()
+        self._stopped = False
+
+    def stop(self):
+        """停止采样并保存结果"""
+        if self._stopped:
+            return
+        self._stopped = True
+        self._sampler.stop()
+        self.profiler._save(self, time.perf_counter() - self._started, self._sampler.stacks)
+
+
+class Profiler():
+    """
+    请求剖析的开关与结果存储
+
+    带有正确管理令牌（X-Profile-Token 请求头）的请求会被剖析，
+    另外按 sample_rate 比例随机抽样；两者都未开启时不做任何额外工作。
+    结果只保留最近 keep 份，启动时已有的结果文件也计入其中。
+    """
+
+    SUFFIX = '.folded'
+
+    def __init__(self, directory, admin_token=None, sample_rate=0.0, interval=0.005, keep=50):
+        self.directory = directory
+        self.admin_token = admin_token
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self._profiles = deque()
+        self._keep = keep
+        self._lock = threading.Lock()
+        self._load_existing()
+
+    def _load_existing(self):
+        """登记之前的进程（包括调试模式的自动重启）留下的结果文件，超出数量的直接删除"""
+        if not os.path.isdir(self.directory):
+            return
+        found = []
+        for filename in os.listdir(self.directory):
+            # 文件名格式: 时间-路由-ID.folded，ID 为 12 位
+            if not filename.endswith(self.SUFFIX):
+                continue
+            stem = filename[:-len(self.SUFFIX)]
+            try:
+                started_at = time.mktime(time.strptime(stem[:15], '%Y%m%d-%H%M%S'))
+            except ValueError:
+                continue
+            path = os.path.join(self.directory, filename)
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    samples = sum(int(line.rsplit(' ', 1)[1]) for line in f if line.strip())
+            except (OSError, ValueError, IndexError):
+                samples = None
+            found.append({
+                "id": stem[-12:],
+                "route": stem[16:-13],
+                "started_at": started_at,
+                "duration": None,
+                "samples": samples,
+                "file": filename
+            })
+        found.sort(key=lambda info: (info["started_at"], info["file"]))
+        with self._lock:
+            self._profiles.extend(found)
+            self._prune()
+
+    def _prune(self):
+        """只保留最近 keep 份结果，调用方需持有锁"""
+        while len(self._profiles) > self._keep:
+            expired = self._profiles.popleft()
+            try:
+                os.remove(os.path.join(self.directory, expired["file"]))
+            except OSError:
+                pass
+
+    def is_admin(self, request):
+        """请求是否携带正确的管理令牌"""
+        if not self.admin_token:
+            return False
+        # 只从请求头读取令牌，放在查询参数中会被访问日志完整记录
+        token = request.headers.get('X-Profile-Token', '')
+        return hmac.compare_digest(token.encode(), self.admin_token.encode())
+
+    def wants(self, request):
+        """当前请求是否需要剖析"""
+        if self.sample_rate and random.random() < self.sample_rate:
+            return True
+        return self.is_admin(request)
+
+    def start(self, route):
+        """开始剖析当前线程"""
+        return ProfileSession(self, route)
+
+    def _save(self, session, duration, stacks):
+        os.makedirs(self.directory, exist_ok=True)
+        safe_route = session.route.strip('/').replace('/', '_').replace('<', '').replace('>', '') or 'root'
+        filename = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(session.started_at))}-{safe_route}-{session.id}{self.SUFFIX}"
+        path = os.path.join(self.directory, filename)
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        info = {
+            "id": session.id,
+            "route": session.route,
+            "started_at": session.started_at,
+            "duration": round(duration, 3),
+            "samples": sum(stacks.values()),
+            "file": filename
+        }
+        with self._lock:
+            self._profiles.append(info)
+            self._prune()
+
+    def list(self):
+        """最近的剖析结果，新的在前"""
+        with self._lock:
+            return list(reversed(self._profiles))
+
+    def get(self, profile_id):
+        """按ID查找剖析结果"""
+        with self._lock:
+            for info in self._profiles:
+                if info["id"] == profile_id:
+                    return info
+        return None
@@ -0,0 +1,90 @@
+"""
+预压缩的静态资源
+启动时一次性生成 gzip / brotli 压缩结果和 ETag，请求时只做协商和缓存校验
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:  # brotli 为可选依赖，未安装时只提供 gzip
+    brotli = None
+
+
+class StaticAsset():
+    """一个预先压缩好的静态资源"""
+
+    def __init__(self, body, mimetype, cache_control='public, max-age=3600'):
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        self.body = body
+        self.mimetype = mimetype
+        self.cache_control = cache_control
+
+        self.encoded = {}
+        compressed = gzip.compress(body, compresslevel=9, mtime=0)
+        if len(compressed) < len(body):
+            self.encoded['gzip'] = compressed
+        if brotli is not None:
+            compressed = brotli.compress(body, quality=11)
+            if len(compressed) < len(body):
+                self.encoded['br'] = compressed
+
+        # 不同编码是不同的表示，强 ETag 需要区分
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        self.etags = {None: digest}
+        for encoding in self.encoded:
+            self.etags[encoding] = f"{digest}-{encoding}"
+
+    @classmethod
+    def from_file(cls, path, cache_control='public, max-age=3600'):
+        """从文件加载资源，按扩展名推断类型"""
+        mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        with open(path, 'rb') as f:
+            return cls(f.read(), mimetype, cache_control)
+
+    def _negotiate(self):
+        """按 Accept-Encoding 选择压缩方式，优先 brotli"""
+        candidates = [encoding for encoding in ('br', 'gzip') if encoding in self.encoded]
+        if not candidates:
+            return None
+        return request.accept_encodings.best_match(candidates)
+
+    def response(self):
+        """生成响应，客户端缓存仍然有效时返回 304"""
+        encoding = self._negotiate()
+        etag = self.etags[encoding]
+        headers = {
+            'Cache-Control': self.cache_control,
+            'Vary': 'Accept-Encoding'
+        }
+
+        # If-None-Match 按 RFC 9110 使用弱比较，缓存加上 W/ 前缀后仍能命中
+        if request.if_none_match.contains_weak(etag):
+            response = Response(status=304, headers=headers)
+            response.set_etag(etag)
+            return response
+
+        response = Response(self.encoded.get(encoding, self.body), mimetype=self.mimetype, headers=headers)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.set_etag(etag)
+        return response
+
+
+def load_static_dir(directory, cache_control='public, max-age=3600'):
+    """加载目录下的全部文件，返回 相对路径 -> StaticAsset"""
+    assets = {}
+    if not os.path.isdir(directory):
+        return assets
+    for root, _, files in os.walk(directory):
+        for name in files:
+            path = os.path.join(root, name)
+            key = os.path.relpath(path, directory).replace(os.sep, '/')
+            assets[key] = StaticAsset.from_file(path, cache_control)
+    return assets
@@ -0,0 +1,189 @@
+"""
+一对多的流式事件广播
+一个生产者发布事件，任意多个订阅者随时加入、断开，互不阻塞
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+
+# 流结束标记
+END = object()
+
+
+class Subscription():
+    """订阅者的事件缓冲区，由请求线程迭代消费"""
+
+    def __init__(self, broadcast=None, latest_only=False):
+        self._broadcast = broadcast
+        self._latest_only = latest_only
+        self._items = deque()
+        self._cond = threading.Condition()
+
+    def push(self, item):
+        """由广播方调用，放入一条事件"""
+        with self._cond:
+            if self._latest_only and item is not END:
+                # 只关心最新状态时，覆盖尚未消费的旧事件
+                self._items.clear()
+            self._items.append(item)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """取出一条事件；超时返回 None，流结束返回 END"""
+        with self._cond:
+            if not self._items:
+                self._cond.wait(timeout)
+            if not self._items:
+                return None
+            item = self._items.popleft()
+            if item is END:
+                # 保留结束标记，重复读取时仍然返回 END
+                self._items.appendleft(END)
+            return item
+
+    def cancel(self):
+        """取消订阅"""
+        if self._broadcast is not None:
+            self._broadcast.unsubscribe(self)
+
+    def __iter__(self):
+        while True:
+            item = self.get()
+            if item is END:
+                return
+            if item is not None:
+                yield item
+
+
+class Broadcast():
+    """
+    事件广播
+
+    history 为 None 时保留全部历史，新订阅者先收到补发的历史事件；
+    为整数时只保留最近 history 条。
+    """
+
+    def __init__(self, history=None):
+        self._lock = threading.Lock()
+        self._history = deque(maxlen=history)
+        self._sinks = set()
+        self.closed = False
+
+    def publish(self, item):
+        """发布一条事件给所有订阅者"""
+        with self._lock:
+            if self.closed:
+                return
+            self._history.append(item)
+            for sink in self._sinks:
+                sink.push(item)
+
+    def subscribe(self, sink=None, latest_only=False):
+        """
+        加入订阅，返回订阅对象
+
+        sink 可以是任何带 push(item) 方法的对象，缺省时创建一个 Subscription。
+        """
+        if sink is None:
+            sink = Subscription(self, latest_only=latest_only)
+        with self._lock:
+            for item in self._history:
+                sink.push(item)
+            if self.closed:
+                sink.push(END)
+            else:
+                self._sinks.add(sink)
+        return sink
+
+    def unsubscribe(self, sink):
+        """移除订阅者"""
+        with self._lock:
+            self._sinks.discard(sink)
+
+    @property
+    def subscriber_count(self):
+        return len(self._sinks)
+
+    def close(self):
+        """结束广播，通知所有订阅者"""
+        with self._lock:
+            if self.closed:
+                return
+            self.closed = True
+            sinks, self._sinks = self._sinks, set()
+            for sink in sinks:
+                sink.push(END)
+
+
+class ScheduledTask():
+    """调度器中的一个数据源"""
+
+    def __init__(self, source, sink):
+        self.source = source
+        self.sink = sink
+        self.cancelled = False
+
+    def cancel(self):
+        """停止驱动该数据源，生成器由调度线程在下次到期时关闭"""
+        self.cancelled = True
+
+
+class Scheduler():
+    """
+    单线程定时调度器
+
+    数据源是产出 (event, data, delay) 的生成器，调度器取出一条事件推送给 sink，
+    再在 delay 秒后取下一条；event 为 None 时不推送，只等待。任意多个数据源共用一个线程，不为每个流占用请求线程。
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def start(self, source, sink):
+        """开始驱动一个数据源，返回可取消的任务"""
+        task = ScheduledTask(source, sink)
+        self._schedule(task, time.monotonic())
+        return task
+
+    def _schedule(self, task, due):
+        with self._cond:
+            heapq.heappush(self._heap, (due, next(self._seq), task))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name='stream-scheduler', daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                due = self._heap[0][0]
+                now = time.monotonic()
+                if due > now:
+                    self._cond.wait(due - now)
+                    continue
+                task = heapq.heappop(self._heap)[2]
+
+            if task.cancelled:
+                task.source.close()
+                continue
+            try:
+                event, data, delay = next(task.source)
+            except StopIteration:
+                task.sink.push(END)
+                continue
+            except Exception:
+                # 单个数据源出错不能影响调度线程
+                task.sink.push(END)
+                continue
+            if event is not None:
+                task.sink.push((event, data))
+            self._schedule(task, time.monotonic() + delay)